@@ -1,4 +1,5 @@
 import json
+import orjson
 from typing import List, Dict, Any, Optional
 
 class CopilotResponseBuilder:
@@ -27,16 +28,9 @@ class CopilotResponseBuilder:
         }
 
     @staticmethod
-    def format_sse(response_data: Dict[str, Any]) -> str:
+    def create_error_response(error_message: str) -> bytes:
         """
-        Formats the dictionary as a Server-Sent Event (SSE) string.
-        """
-        return f"data: {json.dumps(response_data)}\n\n"
-
-    @staticmethod
-    def create_error_response(error_message: str) -> str:
-        """
-        Creates a formatted error response.
+        Creates a formatted error response as an encoded SSE event (bytes).
         """
         error_json = json.dumps({
             "error": {
@@ -44,17 +38,13 @@ class CopilotResponseBuilder:
                 "message": error_message
             }
         })
-        response = CopilotResponseBuilder.build_response(
-            content=error_json,
-            role="assistant",
-            msg_id="msg_error"
-        )
-        return CopilotResponseBuilder.format_sse(response)
+        return _ENVELOPE_PREFIX + orjson.dumps(error_json) + _ERROR_SUFFIX
 
     @staticmethod
-    def create_success_response(commentary: str, data: Optional[Dict[str, Any]] = None) -> str:
+    def create_success_response(commentary: str, data: Optional[Dict[str, Any]] = None) -> bytes:
         """
-        Creates a formatted success response with optional JSON data block.
+        Creates a formatted success response with optional JSON data block,
+        as an encoded SSE event (bytes).
         """
         response_text = commentary
 
@@ -62,5 +52,18 @@ class CopilotResponseBuilder:
             json_str = json.dumps(data)
             response_text += f"\n\n```json\n{json_str}\n```"
 
-        response = CopilotResponseBuilder.build_response(content=response_text)
-        return CopilotResponseBuilder.format_sse(response)
+        return _ENVELOPE_PREFIX + orjson.dumps(response_text) + _SUCCESS_SUFFIX
+
+def _sse_envelope(msg_id: str) -> tuple[bytes, bytes]:
+    """
+    Splits the encoded SSE event for build_response() around its content
+    string. Only the content varies per response, so it is spliced in as an
+    escaped JSON string literal instead of rebuilding and re-encoding the dict.
+    """
+    sentinel = orjson.dumps("\x00content\x00")
+    event = b"data: " + orjson.dumps(CopilotResponseBuilder.build_response("\x00content\x00", msg_id=msg_id)) + b"\n\n"
+    prefix, suffix = event.split(sentinel)
+    return prefix, suffix
+
+_ENVELOPE_PREFIX, _SUCCESS_SUFFIX = _sse_envelope("msg_response")
+_, _ERROR_SUFFIX = _sse_envelope("msg_error")
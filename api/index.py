@@ -5,16 +5,25 @@ import sys
 import math
 import asyncio
 import time
+import zlib
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+import orjson
 from typing import List, Literal, Optional, Union, Dict
 from dotenv import load_dotenv
 import nest_asyncio
 
-nest_asyncio.apply()
+try:
+    nest_asyncio.apply()
+except ValueError:
+    # uvloop loops cannot be patched; nothing here re-enters a running loop.
+    pass
 
-# Configure logging
+# Configure logging (LOG_LEVEL=DEBUG enables request diagnostics)
 logging.basicConfig(
     stream=sys.stdout,
-    level=logging.INFO,
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
@@ -26,7 +35,7 @@ from pydantic import BaseModel, Field
 from pydantic_ai import Agent
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 
 from api.common import PALETTE, PALETTE_MAP, PALETTE_DESCRIPTIONS
 from api.voxel_utils import VoxelGrid, convert_grid_to_chunks, ChunkResponse, CHUNK_SIZE, MIN_COORD, MAX_COORD
@@ -34,12 +43,16 @@ from api.pipeline.octree import SparseVoxelOctree
 from api.pipeline.wfc import WFCLayoutGenerator, ZoneType
 from api.pipeline.assets import AssetGenerator
 from api.pipeline.super_res import SuperResolver
-from api.pipeline.image_gen import ImageToVoxelPipeline
+from api.pipeline.image_gen import ImageToVoxelPipeline, close_http_client
 from api.copilot_utils import CopilotResponseBuilder
 
 # Load environment variables
 load_dotenv(dotenv_path='api/.env.local')
 
+# Image pipeline: nearest palette color per voxel instead of the faster
+# quantized lookup (slightly truer colors at some CPU cost)
+IMAGE_GEN_EXACT_COLORS = os.environ.get("IMAGE_GEN_EXACT_COLORS", "").lower() in ("1", "true", "yes")
+
 # --- Custom Exceptions ---
 
 class APIKeyError(Exception):
@@ -147,6 +160,37 @@ def check_rate_limit(client_ip: str):
         raise RateLimitError("Too many requests")
     request_counts[client_ip].append(current_time)
 
+# --- Exact-match Response Cache ---
+# Bump when the system prompt changes so stale generations are not replayed.
+SYSTEM_PROMPT_VERSION = 1
+RESPONSE_CACHE_MAX_ENTRIES = 256
+# Voxel payloads vary from a few KB to several MB, so also cap total size
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+response_cache: "OrderedDict[int, bytes]" = OrderedDict()
+response_cache_bytes = 0
+response_cache_lock = threading.Lock()
+
+def get_cached_response(key: int) -> Optional[bytes]:
+    with response_cache_lock:
+        payload = response_cache.get(key)
+        if payload is not None:
+            response_cache.move_to_end(key)
+        return payload
+
+def cache_response(key: int, payload: bytes):
+    global response_cache_bytes
+    if len(payload) > RESPONSE_CACHE_MAX_BYTES:
+        return
+    with response_cache_lock:
+        old = response_cache.pop(key, None)
+        if old is not None:
+            response_cache_bytes -= len(old)
+        response_cache[key] = payload
+        response_cache_bytes += len(payload)
+        while len(response_cache) > RESPONSE_CACHE_MAX_ENTRIES or response_cache_bytes > RESPONSE_CACHE_MAX_BYTES:
+            _, evicted = response_cache.popitem(last=False)
+            response_cache_bytes -= len(evicted)
+
 def rasterize_scene(scene_desc: SceneDescription) -> List[ChunkResponse]:
     logger.info(f"Rasterizing {len(scene_desc.shapes)} shapes")
     grid = VoxelGrid()
@@ -435,7 +479,22 @@ def get_agent(system_extension: str = ""):
         )
     )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await close_http_client()
+
+app = FastAPI(lifespan=lifespan)
+
+# CopilotKit probes agent discovery frequently and the answer never changes.
+_DISCOVERY_BYTES = orjson.dumps({
+    "data": {
+        "availableAgents": {
+            "agents": [{"name": "Voxel Scene Generator", "id": "voxel_agent", "__typename": "Agent"}],
+            "__typename": "AvailableAgents"
+        }
+    }
+})
 
 app.add_middleware(
     CORSMiddleware,
@@ -445,6 +504,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip level for SSE bodies: voxel payloads are highly repetitive, so a mid
+# level already gets most of the ratio without stalling the event loop.
+SSE_GZIP_LEVEL = 5
+
+async def gzip_stream(events):
+    """
+    Gzip-encodes an SSE event stream. Each event is sync-flushed so the client
+    can decode it as soon as it arrives.
+    """
+    compressor = zlib.compressobj(SSE_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 -> gzip container
+    async for event in events:
+        if isinstance(event, str):
+            event = event.encode()
+        yield compressor.compress(event) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """
+    True if an Accept-Encoding header allows gzip with q > 0. An explicit
+    gzip (or x-gzip) entry takes precedence over a "*" wildcard.
+    """
+    explicit = wildcard = None
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            explicit = q if explicit is None else max(explicit, q)
+        elif coding == "*":
+            wildcard = q
+    if explicit is not None:
+        return explicit > 0
+    return wildcard is not None and wildcard > 0
+
 async def stream_handler(body: dict, client_ip: str):
     logger.info(f"Stream handler started for IP: {client_ip}")
     try:
@@ -480,6 +580,13 @@ async def stream_handler(body: dict, client_ip: str):
                  if isinstance(content, str):
                      extra_system_prompt += content + "\n"
 
+        cache_key = hash((SYSTEM_PROMPT_VERSION, extra_system_prompt, final_prompt))
+        cached = get_cached_response(cache_key)
+        if cached is not None:
+            logger.info("Serving cached response for identical prompt")
+            yield cached
+            return
+
         agent = get_agent(extra_system_prompt)
 
         try:
@@ -495,12 +602,15 @@ async def stream_handler(body: dict, client_ip: str):
              raise ValueError("Cannot find data in agent result")
 
         chunks_data = []
+        # Placeholder output from a dummy fallback must not be replayed later
+        cacheable = True
         if agent_response.layout_intent == 'image_gen':
              logger.info(f"Using ImageToVoxelPipeline. Prompt: {agent_response.image_gen_prompt}")
-             pipeline = ImageToVoxelPipeline()
+             pipeline = ImageToVoxelPipeline(exact_colors=IMAGE_GEN_EXACT_COLORS)
              # Use generated prompt or fallback to user prompt
              prompt = agent_response.image_gen_prompt or user_prompt
              chunks = await pipeline.run(prompt, multi_view=agent_response.multi_view)
+             cacheable = not pipeline.used_fallback
              chunks_data = [chunk.model_dump() for chunk in chunks]
         elif agent_response.layout_intent:
              # Use Pipeline
@@ -516,7 +626,10 @@ async def stream_handler(body: dict, client_ip: str):
         if chunks_data:
              data_payload = { "chunks": chunks_data }
 
-        yield CopilotResponseBuilder.create_success_response(agent_response.commentary, data_payload)
+        response = CopilotResponseBuilder.create_success_response(agent_response.commentary, data_payload)
+        if cacheable:
+            cache_response(cache_key, response)
+        yield response
 
     except Exception as e:
         logger.error(f"Error in stream_handler: {e}", exc_info=True)
@@ -525,12 +638,34 @@ async def stream_handler(body: dict, client_ip: str):
 @app.post("/api/generate")
 async def run_agent_custom(request: Request):
     try:
-        body = await request.json()
+        body = orjson.loads(await request.body())
     except Exception as e:
         return JSONResponse({"error": "Invalid JSON"}, status_code=400)
 
+    # Bodies can carry base64 screenshots; never dump them wholesale.
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request body keys: %s", list(body.keys()))
+
     if body.get("operationName") == "availableAgents":
-        return JSONResponse({"data": {"availableAgents": {"agents": [{"name": "Voxel Scene Generator", "id": "voxel_agent", "__typename": "Agent"}], "__typename": "AvailableAgents"}}})
+        return Response(content=_DISCOVERY_BYTES, media_type="application/json")
 
     client_ip = request.client.host if request.client else "unknown"
-    return StreamingResponse(stream_handler(body, client_ip), media_type="text/event-stream")
+    events = stream_handler(body, client_ip)
+    if accepts_gzip(request.headers.get("accept-encoding", "")):
+        return StreamingResponse(
+            gzip_stream(events),
+            media_type="text/event-stream",
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return StreamingResponse(events, media_type="text/event-stream")
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "api.index:app",
+        host=os.environ.get("HOST", "127.0.0.1"),
+        port=int(os.environ.get("PORT", "8000")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.environ.get("WEB_CONCURRENCY", "1")),
+    )
@@ -1,4 +1,5 @@
 import random
+import numpy as np
 from .octree import SparseVoxelOctree
 from .wfc import ZoneType, SemanticBlock
 from ..common import PALETTE_MAP
@@ -79,8 +80,10 @@ class AssetGenerator:
         # Leaves (Sphere-ish)
         c_y = y + 8
         r = 6
-        for lx in range(tx - r, tx + r):
-            for ly in range(c_y - r, c_y + r):
-                for lz in range(tz - r, tz + r):
-                     if (lx - tx)**2 + (ly - c_y)**2 + (lz - tz)**2 <= r**2:
-                         self.octree.set_voxel(lx, ly, lz, PALETTE_MAP['leaves'])
+        lx, ly, lz = np.meshgrid(
+            np.arange(tx - r, tx + r), np.arange(c_y - r, c_y + r), np.arange(tz - r, tz + r),
+            indexing="ij",
+        )
+        mask = (lx - tx)**2 + (ly - c_y)**2 + (lz - tz)**2 <= r**2
+        xs, ys, zs = lx[mask], ly[mask], lz[mask]
+        self.octree.set_voxels(xs, ys, zs, PALETTE_MAP['leaves'])
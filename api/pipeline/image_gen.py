@@ -2,6 +2,7 @@ import os
 import asyncio
 import logging
 import math
+import functools
 from io import BytesIO
 import numpy as np
 from PIL import Image, ImageDraw
@@ -14,6 +15,7 @@ logger = logging.getLogger(__name__)
 # Check for dependencies
 try:
     from openai import AsyncOpenAI
+    import httpx
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
@@ -27,6 +29,34 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
     logger.warning("Transformers/Torch not found. Running in dummy mode.")
 
+try:
+    from scipy.spatial import cKDTree
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Shared client for image downloads so connections (and TLS sessions) are
+# reused across requests. Closed by the app's lifespan hook.
+_http_client = None
+
+def _get_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=30.0)
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
 class ImageGenerator:
     def __init__(self, api_key=None, dummy=False):
         self.dummy = dummy or not OPENAI_AVAILABLE
@@ -63,16 +93,42 @@ class ImageGenerator:
                 quality="standard",
                 n=1,
             )
-            import httpx
-            async with httpx.AsyncClient() as client:
-                r = await client.get(response.data[0].url)
-                return Image.open(BytesIO(r.content))
+            # Stream the body into one buffer instead of materializing
+            # r.content and then copying it into a BytesIO.
+            client = _get_http_client()
+            buf = BytesIO()
+            async with client.stream("GET", response.data[0].url) as r:
+                r.raise_for_status()
+                async for chunk in r.aiter_bytes(65536):
+                    buf.write(chunk)
+            buf.seek(0)
+            return Image.open(buf)
         except Exception as e:
             logger.error(f"Image generation failed: {e}")
             # Fallback to dummy
             self.dummy = True
             return await self.generate(prompt, size)
 
+@functools.lru_cache(maxsize=1)
+def _get_depth_pipe(device: str):
+    """
+    Loads Depth Anything V2 once per process; the weights are shared by every
+    DepthEstimator. Half precision on CUDA halves weight/activation traffic.
+    """
+    logger.info(f"Loading Depth Anything V2 on {device}...")
+    dtype = torch.float16 if device == "cuda" else torch.float32
+    return pipeline(task="depth-estimation", model="depth-anything/Depth-Anything-V2-Small-hf", device=device, torch_dtype=dtype)
+
+@functools.lru_cache(maxsize=8)
+def _dummy_depth(w: int, h: int) -> np.ndarray:
+    """Dummy depth: Cone shape. Depends only on size, so it is cached (read-only)."""
+    x = np.linspace(-1, 1, w)
+    y = np.linspace(-1, 1, h)
+    xv, yv = np.meshgrid(x, y)
+    d = np.clip(1.0 - np.hypot(xv, yv), 0, 1)
+    d.setflags(write=False)
+    return d
+
 class DepthEstimator:
     def __init__(self, dummy=False):
         self.dummy = dummy or not TRANSFORMERS_AVAILABLE
@@ -83,8 +139,7 @@ class DepthEstimator:
                 device = "cpu"
                 if torch.cuda.is_available():
                     device = "cuda"
-                logger.info(f"Loading Depth Anything V2 on {device}...")
-                self.pipe = pipeline(task="depth-estimation", model="depth-anything/Depth-Anything-V2-Small-hf", device=device)
+                self.pipe = _get_depth_pipe(device)
             except Exception as e:
                 logger.error(f"Failed to load depth model: {e}")
                 self.dummy = True
@@ -92,25 +147,81 @@ class DepthEstimator:
     def estimate(self, image: Image.Image):
         if self.dummy:
             w, h = image.size
-            # Dummy depth: Cone shape
-            x = np.linspace(-1, 1, w)
-            y = np.linspace(-1, 1, h)
-            xv, yv = np.meshgrid(x, y)
-            d = 1.0 - np.sqrt(xv**2 + yv**2)
-            d = np.clip(d, 0, 1)
-            return d # Returns numpy array 0..1
-
-        result = self.pipe(image)
-        depth = np.array(result["depth"])
+            return _dummy_depth(w, h) # Returns numpy array 0..1
+
+        with torch.inference_mode():
+            result = self.pipe(image)
+        return self._normalize(result["depth"])
+
+    def estimate_batch(self, images: list[Image.Image]):
+        """Depth for several views in one batched forward pass."""
+        if self.dummy:
+            return [_dummy_depth(*image.size) for image in images]
+
+        with torch.inference_mode():
+            results = self.pipe(images, batch_size=len(images))
+        return [self._normalize(result["depth"]) for result in results]
+
+    @staticmethod
+    def _normalize(depth_img) -> np.ndarray:
+        depth = np.array(depth_img)
         # Normalize to 0..1
         depth = (depth - depth.min()) / (depth.max() - depth.min())
         return depth
 
+@functools.lru_cache(maxsize=1)
+def _palette_lut() -> np.ndarray:
+    """
+    Builds (once) a 32KB RGB555 -> palette index lookup table. Each entry holds
+    the palette color nearest to the center of its 8x8x8 RGB bin.
+    """
+    palette_rgb = np.array(PALETTE_RGB)
+    keys = np.arange(1 << 15, dtype=np.int32)
+    bins = np.stack([(keys >> 10) & 31, (keys >> 5) & 31, keys & 31], axis=1)
+    centers = (bins << 3) | 4
+    diff = centers[:, np.newaxis, :] - palette_rgb[np.newaxis, :, :]
+    return np.argmin(np.sum(diff**2, axis=2), axis=1).astype(np.uint8)
+
+@functools.lru_cache(maxsize=1)
+def _palette_tree():
+    """k-d tree over the palette for exact nearest-color queries."""
+    return cKDTree(np.array(PALETTE_RGB, dtype=np.float32))
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _nearest_palette(colors, palette):
+        """
+        Brute-force nearest palette color with a best-so-far early exit: the
+        squared distance is accumulated per channel and abandoned as soon as
+        it can no longer beat the current best.
+        """
+        N = colors.shape[0]
+        M = palette.shape[0]
+        out = np.empty(N, dtype=np.uint8)
+        for n in prange(N):
+            r, g, b = colors[n, 0], colors[n, 1], colors[n, 2]
+            best = 1 << 30
+            best_i = 0
+            for m in range(M):
+                d = (r - palette[m, 0]) * (r - palette[m, 0])
+                if d >= best:
+                    continue
+                d += (g - palette[m, 1]) * (g - palette[m, 1])
+                if d >= best:
+                    continue
+                d += (b - palette[m, 2]) * (b - palette[m, 2])
+                if d < best:
+                    best = d
+                    best_i = m
+            out[n] = best_i
+        return out
+
 class VoxelProjector:
     def __init__(self, grid_size=64):
         self.grid_size = grid_size
         # Convert palette to numpy for fast matching
         self.palette_rgb = np.array(PALETTE_RGB) # (M, 3)
+        self._lut = _palette_lut()
 
     def project(self, image: Image.Image, depth_map: np.ndarray, view_matrix=None, thickness=0):
         """
@@ -123,11 +234,15 @@ class VoxelProjector:
         img_arr = np.array(image)
 
         # 1. Background Removal
-        mask_fg = (img_arr[:, :, 0] < 250) | (img_arr[:, :, 1] < 250) | (img_arr[:, :, 2] < 250)
+        # A pixel is background only if all channels are >= 250, i.e. if its
+        # darkest channel is. Reducing the channels with a uint8 minimum
+        # leaves one comparison and one bool mask instead of three OR'd ones.
+        darkest = np.minimum(np.minimum(img_arr[:, :, 0], img_arr[:, :, 1]), img_arr[:, :, 2])
+        mask_fg = darkest < 250
         y_idxs, x_idxs = np.where(mask_fg)
 
         if len(y_idxs) == 0:
-            return np.empty((0, 3)), np.empty((0, 3))
+            return np.empty((0, 3)), np.empty((0, 3), dtype=np.uint8)
 
         # 2. Unproject to Camera Space
         fov_deg = 45.0
@@ -142,53 +257,55 @@ class VoxelProjector:
         base_z_camera = z_max - (d_vals * (z_max - z_min)) # 1->min(close), 0->max(far)
 
         # Thickness Extrusion
-        # We repeat the pixels `thickness` times, adding to Z each time
-        # This is memory intensive for large thickness, but ok for small (2-5)
-
-        # Prepare lists to concatenate
-        all_z = [base_z_camera]
-        for t in range(1, thickness + 1):
-            all_z.append(base_z_camera + t) # Extrude deeper
-
-        # We also need to duplicate x_idxs, y_idxs, colors
-        # Efficient way: Repeat indices
-        num_pixels = len(base_z_camera)
-        total_points = num_pixels * (thickness + 1)
-
-        # Tile indices and colors
-        # (N,) -> (N * T,)
-        # Note: we need to pair (x,y) with (z, z+1...).
-        # np.tile([1,2], 2) -> [1,2,1,2].
-        # But we want z to change.
-        # Let's stack z arrays: (T, N) -> flatten -> (T*N,)
-        z_camera_combined = np.concatenate(all_z)
-
-        # Tile x, y, colors T times
-        # np.tile tiles the whole array.
-        x_idxs_combined = np.tile(x_idxs, thickness + 1)
-        y_idxs_combined = np.tile(y_idxs, thickness + 1)
+        # Each pixel is extruded `thickness` voxels deeper. Broadcasting the
+        # depth offsets as a (T+1, 1) column against the (N,) pixel arrays
+        # yields all layers at once; X/Y are recomputed per layer so the
+        # extrusion stays perspective correct.
+        dz = np.arange(thickness + 1)[:, np.newaxis] # (T+1, 1)
+        z_camera = base_z_camera[np.newaxis, :] + dz # (T+1, N)
+        x_camera = (x_idxs[np.newaxis, :] - c_x) * z_camera / f_x
+        y_camera = (y_idxs[np.newaxis, :] - c_y) * z_camera / f_y
 
-        colors_subset = img_arr[y_idxs, x_idxs]
-        colors_combined = np.tile(colors_subset, (thickness + 1, 1))
-
-        # Re-calculate X, Y for new Zs (perspective correct thickness)
-        x_camera = (x_idxs_combined - c_x) * z_camera_combined / f_x
-        y_camera = (y_idxs_combined - c_y) * z_camera_combined / f_y
+        points_camera = np.stack([x_camera.ravel(), y_camera.ravel(), z_camera.ravel()], axis=1) # (N*(T+1), 3)
 
-        points_camera = np.stack([x_camera, y_camera, z_camera_combined, np.ones(total_points)], axis=1)
+        colors_subset = img_arr[y_idxs, x_idxs]
+        colors_combined = np.broadcast_to(colors_subset, (thickness + 1,) + colors_subset.shape).reshape(-1, colors_subset.shape[-1])
 
         # 3. Transform to World Space
+        # Points are affine (w=1), so apply rotation and translation directly
+        # instead of carrying a homogeneous column through the product.
         if view_matrix is None:
-            view_matrix = np.eye(4)
+            return points_camera, colors_combined
 
-        points_world = (view_matrix @ points_camera.T).T # (N, 4)
+        R = view_matrix[:3, :3]
+        t = view_matrix[:3, 3]
+        points_world = np.matmul(points_camera, R.T) + t
 
-        return points_world[:, :3], colors_combined
+        return points_world, colors_combined
+
+    def match_materials(self, colors, exact=False):
+        """
+        Maps RGB colors (N, 3) to palette indices. By default colors are
+        quantized to RGB555 and resolved with a single LUT gather; pass
+        exact=True for a true nearest-color match.
+        """
+        colors = np.asarray(colors)[:, :3]
+        if exact:
+            return self._match_exact(colors)
+        c = colors.astype(np.uint32)
+        key = ((c[:, 0] >> 3) << 10) | ((c[:, 1] >> 3) << 5) | (c[:, 2] >> 3)
+        return self._lut[key]
+
+    def _match_exact(self, colors):
+        if SCIPY_AVAILABLE:
+            _, idx = _palette_tree().query(colors.astype(np.float32), k=1, workers=-1)
+            return idx.astype(np.uint8)
+        if NUMBA_AVAILABLE:
+            return _nearest_palette(colors.astype(np.int32), self.palette_rgb.astype(np.int32))
 
-    def match_materials(self, colors):
         N = len(colors)
         chunk_s = 5000
-        mat_indices = np.zeros(N, dtype=int)
+        mat_indices = np.empty(N, dtype=np.uint8)
         for i in range(0, N, chunk_s):
             end = min(i+chunk_s, N)
             c_chunk = colors[i:end]
@@ -199,30 +316,46 @@ class VoxelProjector:
 
 
 class ImageToVoxelPipeline:
-    def __init__(self, grid_size=64):
+    def __init__(self, grid_size=64, exact_colors=False):
         api_key = os.environ.get("OPENAI_API_KEY")
         self.generator = ImageGenerator(api_key=api_key)
         self.estimator = DepthEstimator()
         self.projector = VoxelProjector(grid_size=grid_size)
         self.grid_size = grid_size
+        # True: nearest palette color per voxel instead of the RGB555 LUT
+        self.exact_colors = exact_colors
+
+    @property
+    def used_fallback(self):
+        """True if the generator or estimator ran in (or fell back to) dummy mode."""
+        return self.generator.dummy or self.estimator.dummy
 
     async def run(self, prompt: str, multi_view=False):
         logger.info(f"Pipeline Start. Multi-view: {multi_view}")
 
         views = [] # (image, depth, matrix)
 
-        # 1. Front View
+        # 1. Generate the view images. The DALL-E calls are independent and
+        # IO-bound, so in multi-view mode both are issued concurrently.
         prompt_front = f"Isometric view, {prompt}, diorama style, orthographic projection, 3D render, white background"
-        img_front = await self.generator.generate(prompt_front)
-        depth_front = self.estimator.estimate(img_front)
-        views.append((img_front, depth_front, np.eye(4))) # Identity
-
         if multi_view:
-            # 2. Back View
             prompt_back = f"Isometric view, back view of {prompt}, diorama style, orthographic projection, 3D render, white background"
-            img_back = await self.generator.generate(prompt_back)
-            depth_back = self.estimator.estimate(img_back)
+            img_front, img_back = await asyncio.gather(
+                self.generator.generate(prompt_front),
+                self.generator.generate(prompt_back),
+            )
+        else:
+            img_front = await self.generator.generate(prompt_front)
+
+        # 2. Depth estimation shares one model and runs off the event loop;
+        # in multi-view mode both views go through it as a single batch.
+        if multi_view:
+            depth_front, depth_back = await asyncio.to_thread(self.estimator.estimate_batch, [img_front, img_back])
+        else:
+            depth_front = await asyncio.to_thread(self.estimator.estimate, img_front)
+        views.append((img_front, depth_front, np.eye(4))) # Identity
 
+        if multi_view:
             # Rotation Matrix for Back View (180 deg around Y)
             theta = np.pi
             c, s = np.cos(theta), np.sin(theta)
@@ -259,35 +392,36 @@ class ImageToVoxelPipeline:
         max_p = np.max(combined_points, axis=0)
         center_p = (min_p + max_p) / 2.0
 
-        # Center at Grid Center
+        # Center at Grid Center and flip Y (Voxel Up is +Y, Camera/Image Up
+        # is -Y usually) relative to the center. Both fold into a single
+        # per-axis sign and shift:
+        #   x' = x - c + g,   y' = 2g - (y - c + g) = -y + c + g
         grid_center = np.array([self.grid_size/2, self.grid_size/2, self.grid_size/2])
-        points_centered = combined_points - center_p + grid_center
-
-        # Flip Y (Voxel Up is +Y, Camera/Image Up is -Y usually)
-        # Flip relative to center
-        points_centered[:, 1] = (grid_center[1] * 2) - points_centered[:, 1]
+        sign = np.array([1.0, -1.0, 1.0])
+        shift = grid_center - sign * center_p
 
-        # 5. Quantize
-        ix = np.round(points_centered[:, 0]).astype(int)
-        iy = np.round(points_centered[:, 1]).astype(int)
-        iz = np.round(points_centered[:, 2]).astype(int)
+        # 5. Quantize and filter out of bounds in one pass
+        q = np.rint(combined_points * sign + shift)
+        mask = np.all((q >= 0) & (q < self.grid_size), axis=1)
 
-        # Filter out of bounds
-        mask = (ix >= 0) & (ix < self.grid_size) & \
-               (iy >= 0) & (iy < self.grid_size) & \
-               (iz >= 0) & (iz < self.grid_size)
-
-        ix = ix[mask]
-        iy = iy[mask]
-        iz = iz[mask]
+        # In-bounds coordinates are < grid_size, so int16 is ample
+        ix, iy, iz = q[mask].astype(np.int16).T
         colors_final = combined_colors[mask]
 
+        # Many pixels (and extrusion layers) land on the same voxel. Keep only
+        # the last point per voxel, which is the one a sequential scatter
+        # would leave, before color matching and writing.
+        K = self.grid_size
+        keys = (ix.astype(np.int32) * K + iy) * K + iz
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - last
+        ix, iy, iz, colors_final = ix[keep], iy[keep], iz[keep], colors_final[keep]
+
         # 6. Color Match and Voxelize
-        mat_indices = self.projector.match_materials(colors_final)
+        mat_indices = self.projector.match_materials(colors_final, exact=self.exact_colors)
 
         grid = VoxelGrid()
-        for i in range(len(ix)):
-            grid.set_voxel(ix[i], iy[i], iz[i], mat_indices[i])
+        grid.set_voxels(ix, iy, iz, mat_indices)
 
         # 7. Convert to Chunks
         chunks = convert_grid_to_chunks(grid.chunks)
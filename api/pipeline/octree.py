@@ -1,5 +1,6 @@
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Tuple, Optional, Sequence
 import math
+import numpy as np
 
 CHUNK_SIZE = 32
 
@@ -10,16 +11,16 @@ class SparseVoxelOctree:
     with the frontend's RLE chunk format.
     """
     def __init__(self):
-        # Map (cx, cy, cz) -> List[int] (size 32^3)
-        self.chunks: Dict[Tuple[int, int, int], List[int]] = {}
+        # Map (cx, cy, cz) -> uint8 array (size 32^3)
+        self.chunks: Dict[Tuple[int, int, int], np.ndarray] = {}
         self.min_bounds = [float('inf'), float('inf'), float('inf')]
         self.max_bounds = [float('-inf'), float('-inf'), float('-inf')]
 
-    def get_chunk(self, cx: int, cy: int, cz: int) -> List[int]:
+    def get_chunk(self, cx: int, cy: int, cz: int) -> np.ndarray:
         key = (cx, cy, cz)
         if key not in self.chunks:
             # Initialize with 0 (Air)
-            self.chunks[key] = [0] * (CHUNK_SIZE ** 3)
+            self.chunks[key] = np.zeros(CHUNK_SIZE ** 3, dtype=np.uint8)
         return self.chunks[key]
 
     def set_voxel(self, x: int, y: int, z: int, material_id: int):
@@ -35,6 +36,43 @@ class SparseVoxelOctree:
         self.min_bounds = [min(self.min_bounds[0], x), min(self.min_bounds[1], y), min(self.min_bounds[2], z)]
         self.max_bounds = [max(self.max_bounds[0], x), max(self.max_bounds[1], y), max(self.max_bounds[2], z)]
 
+    def set_voxels(self, xs: Sequence[int], ys: Sequence[int], zs: Sequence[int], material_id: int):
+        """
+        Bulk insert of voxels given as parallel coordinate arrays (SoA).
+        Points are grouped by chunk so each chunk is scattered into once, and
+        the bounds are updated once for the whole batch.
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        zs = np.asarray(zs, dtype=np.int64)
+        if xs.size == 0:
+            return
+
+        cx, rx = np.divmod(xs, CHUNK_SIZE)
+        cy, ry = np.divmod(ys, CHUNK_SIZE)
+        cz, rz = np.divmod(zs, CHUNK_SIZE)
+        flat = rx + ry * CHUNK_SIZE + rz * CHUNK_SIZE * CHUNK_SIZE
+
+        # The octree is unbounded, so pack chunk coords into one scalar key
+        # relative to this batch's extent, then sort so each chunk's points
+        # form a contiguous run
+        ox, oy, oz = cx.min(), cy.min(), cz.min()
+        span_y = cy.max() - oy + 1
+        span_z = cz.max() - oz + 1
+        keys = ((cx - ox) * span_y + (cy - oy)) * span_z + (cz - oz)
+        order = np.argsort(keys, kind="stable")
+        keys, flat = keys[order], flat[order]
+        cx, cy, cz = cx[order], cy[order], cz[order]
+
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        ends = np.append(starts[1:], keys.size)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            chunk = self.get_chunk(int(cx[start]), int(cy[start]), int(cz[start]))
+            chunk[flat[start:end]] = material_id
+
+        self.min_bounds = [min(self.min_bounds[0], int(xs.min())), min(self.min_bounds[1], int(ys.min())), min(self.min_bounds[2], int(zs.min()))]
+        self.max_bounds = [max(self.max_bounds[0], int(xs.max())), max(self.max_bounds[1], int(ys.max())), max(self.max_bounds[2], int(zs.max()))]
+
     def get_voxel(self, x: int, y: int, z: int) -> int:
         cx, rx = divmod(x, CHUNK_SIZE)
         cy, ry = divmod(y, CHUNK_SIZE)
@@ -45,7 +83,7 @@ class SparseVoxelOctree:
 
         chunk = self.chunks[(cx, cy, cz)]
         index = rx + ry * CHUNK_SIZE + rz * CHUNK_SIZE * CHUNK_SIZE
-        return chunk[index]
+        return int(chunk[index])
 
     def fill_region(self, start: Tuple[int, int, int], size: Tuple[int, int, int], material_id: int):
         sx, sy, sz = start
@@ -74,18 +112,33 @@ class SparseVoxelOctree:
                     if isx >= iex or isy >= iey or isz >= iez:
                         continue
 
-                    # If fully contained, fill chunk (if efficient)
-                    # For now, just iterate voxels in intersection
                     chunk = self.get_chunk(cx, cy, cz)
 
                     # Local coords
                     lsx, lsy, lsz = isx - csx, isy - csy, isz - csz
                     lex, ley, lez = iex - csx, iey - csy, iez - csz
 
+                    plane = CHUNK_SIZE * CHUNK_SIZE
+                    full_x = lsx == 0 and lex == CHUNK_SIZE
+                    full_y = lsy == 0 and ley == CHUNK_SIZE
+
+                    if full_x and full_y:
+                        # Whole XY planes are contiguous: one slab fill
+                        # (the entire chunk when fully contained)
+                        chunk[lsz * plane : lez * plane] = material_id
+                        continue
+
+                    if full_x:
+                        # Full rows: one contiguous run of rows per plane
+                        for z in range(lsz, lez):
+                            z_offset = z * plane
+                            chunk[z_offset + lsy * CHUNK_SIZE : z_offset + ley * CHUNK_SIZE] = material_id
+                        continue
+
                     for z in range(lsz, lez):
-                        z_offset = z * CHUNK_SIZE * CHUNK_SIZE
+                        z_offset = z * plane
                         for y in range(lsy, ley):
                             y_offset = y * CHUNK_SIZE
                             base = z_offset + y_offset
-                            # Python slice assignment is faster
-                            chunk[base + lsx : base + lex] = [material_id] * (lex - lsx)
+                            # Broadcast fill of the row, no temporary list
+                            chunk[base + lsx : base + lex] = material_id
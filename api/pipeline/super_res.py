@@ -1,7 +1,64 @@
 import random
+import numpy as np
 from .octree import SparseVoxelOctree, CHUNK_SIZE
 from ..common import PALETTE_MAP
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+def _refine_kernel(chunk, cx, cy, cz, dirt_id, grass_id):
+    """
+    Weathering pass over one flat 32^3 chunk: dirt voxels with air above
+    them turn to grass, gated by a deterministic positional hash.
+    Writes only swap one solid material for another, so iterations are
+    independent and safe to run in parallel.
+    """
+    for i in prange(chunk.shape[0]):
+        if chunk[i] != dirt_id:
+            continue
+
+        # index = rx + ry * 32 + rz * 1024
+        rz = i >> 10
+        ry = (i >> 5) & 31
+        rx = i & 31
+
+        # Global coords (for deterministic noise)
+        gx = cx * 32 + rx
+        gy = cy * 32 + ry
+        gz = cz * 32 + rz
+
+        # Noise function: (seed % 100) / 100.0 > 0.8
+        seed = (gx * 73856093) ^ (gy * 19349663) ^ (gz * 83492791)
+        if seed % 100 > 80 and ry < 31 and chunk[i + 32] == 0:
+            chunk[i] = grass_id
+
+# Local coords of every flat chunk index, shared by all chunks for the
+# vectorized path (index = rx + ry * 32 + rz * 1024)
+_IDX = np.arange(CHUNK_SIZE ** 3, dtype=np.int64)
+_RX = _IDX & 31
+_RY = (_IDX >> 5) & 31
+_RZ = _IDX >> 10
+
+def _refine_vectorized(chunk, cx, cy, cz, dirt_id, grass_id):
+    """
+    NumPy equivalent of _refine_kernel for when Numba is unavailable: the
+    hash, the air-above test and the write are each one whole-chunk pass.
+    """
+    seed = ((cx * 32 + _RX) * 73856093) ^ ((cy * 32 + _RY) * 19349663) ^ ((cz * 32 + _RZ) * 83492791)
+    air_above = np.zeros(chunk.shape, dtype=bool)
+    air_above[:-32] = chunk[32:] == 0
+    mask = (chunk == dirt_id) & (seed % 100 > 80) & (_RY < 31) & air_above
+    chunk[mask] = grass_id
+
+if NUMBA_AVAILABLE:
+    _refine = njit(parallel=True, cache=True)(_refine_kernel)
+else:
+    _refine = _refine_vectorized
+
 class SuperResolver:
     """
     Simulates the Voxel Super-Resolution step by adding high-frequency detail
@@ -22,44 +79,8 @@ class SuperResolver:
             chunk = self.octree.chunks[(cx, cy, cz)]
             self._refine_chunk(chunk, cx, cy, cz)
 
-    def _refine_chunk(self, chunk: list, cx: int, cy: int, cz: int):
-        # Simple procedural noise
-        # If we find "Stone", maybe turn it into "Mossy Stone" (if we had it)
-        # Or add random noise to surfaces.
-
-        # For this implementation, we will simulate "Weathering"
-        # Randomly erode edges or add moss (Green voxels on top of stone)
-
-        for i in range(len(chunk)):
-            val = chunk[i]
-            if val == 0: continue
-
-            # Reconstruct local coords
-            # index = rx + ry * 32 + rz * 1024
-            rz = i // 1024
-            rem = i % 1024
-            ry = rem // 32
-            rx = rem % 32
-
-            # Global coords (for deterministic noise)
-            gx = cx * CHUNK_SIZE + rx
-            gy = cy * CHUNK_SIZE + ry
-            gz = cz * CHUNK_SIZE + rz
-
-            # Noise function
-            seed = (gx * 73856093) ^ (gy * 19349663) ^ (gz * 83492791)
-            noise = (seed % 100) / 100.0
-
-            # Detail: Grass on Dirt
-            if val == PALETTE_MAP.get('dirt') and noise > 0.8:
-                # Check if air above? (Too expensive to check neighbor chunks here)
-                # Just random variation
-                if (ry < 31):
-                    # Local check
-                    above = chunk[rx + (ry+1)*32 + rz*1024]
-                    if above == 0:
-                        chunk[i] = PALETTE_MAP.get('grass', 1)
-
-            # Detail: Texture variation
-            # (In Voxelito, variations are handled by the shader/mesher based on position,
-            # so we don't need to change IDs unless we change materials)
+    def _refine_chunk(self, chunk: np.ndarray, cx: int, cy: int, cz: int):
+        # Simulate "Weathering": grass on exposed dirt.
+        # (In Voxelito, texture variations are handled by the shader/mesher
+        # based on position, so we only change IDs when materials change.)
+        _refine(chunk, cx, cy, cz, PALETTE_MAP.get('dirt'), PALETTE_MAP.get('grass', 1))
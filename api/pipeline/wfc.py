@@ -1,4 +1,7 @@
 import random
+import bisect
+import itertools
+from collections import deque
 from typing import List, Dict, Set, Tuple, Optional
 from enum import Enum
 
@@ -10,6 +13,11 @@ class ZoneType(str, Enum):
     PARK = "park"
     WATER = "water"
 
+# Zones placed next to roads. Cumulative weights are built once here;
+# random.choices would rebuild them on every call.
+ROADSIDE_ZONES = (ZoneType.RESIDENTIAL, ZoneType.COMMERCIAL, ZoneType.PARK)
+ROADSIDE_CUM_WEIGHTS = tuple(itertools.accumulate((0.6, 0.2, 0.2)))
+
 class SemanticBlock:
     def __init__(self, x: int, y: int, z: int, zone: ZoneType):
         self.x = x
@@ -60,14 +68,14 @@ class WFCLayoutGenerator:
         cursor_x, cursor_z = self.width // 2, self.depth // 2
         self.grid[(cursor_x, road_y, cursor_z)] = ZoneType.ROAD
 
-        open_set = [(cursor_x, road_y, cursor_z)]
+        open_set = deque([(cursor_x, road_y, cursor_z)])
         visited = set()
         visited.add((cursor_x, road_y, cursor_z))
 
         # Grow roads
         for _ in range(int(self.width * self.depth * 0.2)): # 20% density
             if not open_set: break
-            cx, cy, cz = open_set.pop(0) # BFS for sprawl
+            cx, cy, cz = open_set.popleft() # BFS for sprawl
 
             neighbors = self.get_neighbors(cx, cy, cz)
             random.shuffle(neighbors)
@@ -82,10 +90,8 @@ class WFCLayoutGenerator:
                     open_set.append((nx, ny, nz))
                 else:
                     # Place building next to road
-                    choice = random.choices(
-                        [ZoneType.RESIDENTIAL, ZoneType.COMMERCIAL, ZoneType.PARK],
-                        weights=[0.6, 0.2, 0.2]
-                    )[0]
+                    r = random.random() * ROADSIDE_CUM_WEIGHTS[-1]
+                    choice = ROADSIDE_ZONES[bisect.bisect(ROADSIDE_CUM_WEIGHTS, r)]
                     self.grid[(nx, ny, nz)] = choice
                     visited.add((nx, ny, nz))
 
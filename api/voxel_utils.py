@@ -1,4 +1,5 @@
 from typing import List, Dict
+import numpy as np
 from pydantic import BaseModel
 from api.common import PALETTE
 
@@ -6,6 +7,8 @@ from api.common import PALETTE
 MIN_COORD = -512
 MAX_COORD = 512
 CHUNK_SIZE = 32
+# Chunks per axis inside [MIN_COORD, MAX_COORD), used to pack chunk keys
+CHUNK_SPAN = (MAX_COORD - MIN_COORD) // CHUNK_SIZE
 
 # --- API Models ---
 class ChunkResponse(BaseModel):
@@ -16,16 +19,16 @@ class ChunkResponse(BaseModel):
 # --- Voxel Grid Logic ---
 class VoxelGrid:
     def __init__(self):
-        self.chunks: Dict[tuple, List[int]] = {}
+        self.chunks: Dict[tuple, np.ndarray] = {}
 
     def get_chunk(self, cx, cy, cz):
         key = (cx, cy, cz)
         if key not in self.chunks:
-            self.chunks[key] = [0] * (CHUNK_SIZE ** 3)
+            self.chunks[key] = np.zeros(CHUNK_SIZE ** 3, dtype=np.uint8)
         return self.chunks[key]
 
     def fill_chunk(self, cx, cy, cz, material_idx):
-        self.chunks[(cx, cy, cz)] = [material_idx] * (CHUNK_SIZE ** 3)
+        self.chunks[(cx, cy, cz)] = np.full(CHUNK_SIZE ** 3, material_idx, dtype=np.uint8)
 
     def set_voxel(self, x, y, z, material_idx):
         if not (MIN_COORD <= x < MAX_COORD and MIN_COORD <= y < MAX_COORD and MIN_COORD <= z < MAX_COORD):
@@ -37,20 +40,51 @@ class VoxelGrid:
         index = rx + ry * CHUNK_SIZE + rz * CHUNK_SIZE * CHUNK_SIZE
         chunk[index] = material_idx
 
+    def set_voxels(self, xs, ys, zs, material_ids):
+        """
+        Vectorized equivalent of calling set_voxel for each (x, y, z, material).
+        Points are grouped by chunk so each chunk is scattered into once; on
+        duplicate coordinates the later point wins, as with repeated set_voxel.
+        """
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.int64)
+        zs = np.asarray(zs, dtype=np.int64)
+        material_ids = np.broadcast_to(np.asarray(material_ids, dtype=np.uint8), xs.shape)
+
+        in_bounds = (xs >= MIN_COORD) & (xs < MAX_COORD) & \
+                    (ys >= MIN_COORD) & (ys < MAX_COORD) & \
+                    (zs >= MIN_COORD) & (zs < MAX_COORD)
+        xs, ys, zs, material_ids = xs[in_bounds], ys[in_bounds], zs[in_bounds], material_ids[in_bounds]
+        if xs.size == 0:
+            return
+
+        cx, rx = np.divmod(xs, CHUNK_SIZE)
+        cy, ry = np.divmod(ys, CHUNK_SIZE)
+        cz, rz = np.divmod(zs, CHUNK_SIZE)
+        flat = rx + ry * CHUNK_SIZE + rz * CHUNK_SIZE * CHUNK_SIZE
+
+        # Pack chunk coords into one scalar key and sort (stably) so each
+        # chunk's points form a contiguous run
+        offset = MIN_COORD // CHUNK_SIZE
+        keys = ((cx - offset) * CHUNK_SPAN + (cy - offset)) * CHUNK_SPAN + (cz - offset)
+        order = np.argsort(keys, kind="stable")
+        keys, flat, material_ids = keys[order], flat[order], material_ids[order]
+        cx, cy, cz = cx[order], cy[order], cz[order]
+
+        starts = np.concatenate(([0], np.flatnonzero(keys[1:] != keys[:-1]) + 1))
+        ends = np.append(starts[1:], keys.size)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            chunk = self.get_chunk(int(cx[start]), int(cy[start]), int(cz[start]))
+            chunk[flat[start:end]] = material_ids[start:end]
+
 def convert_grid_to_chunks(chunks_dict: Dict[tuple, List[int]]) -> List[ChunkResponse]:
     response_chunks = []
     for (cx, cy, cz), voxels in chunks_dict.items():
-        rle_parts = []
-        current_val = voxels[0]
-        current_count = 1
-        for val in voxels[1:]:
-            if val == current_val:
-                current_count += 1
-            else:
-                rle_parts.append(f"{current_val}:{current_count}")
-                current_val = val
-                current_count = 1
-        rle_parts.append(f"{current_val}:{current_count}")
-        rle_str = ",".join(rle_parts)
+        arr = np.asarray(voxels, dtype=np.int32)
+        # Run boundaries are where the value changes; lengths are their spacing
+        bounds = np.concatenate(([0], np.flatnonzero(arr[1:] != arr[:-1]) + 1, [arr.size]))
+        vals = arr[bounds[:-1]].tolist()
+        counts = np.diff(bounds).tolist()
+        rle_str = ",".join([f"{v}:{c}" for v, c in zip(vals, counts)])
         response_chunks.append(ChunkResponse(position=[cx, cy, cz], rle_data=rle_str, palette=PALETTE))
     return response_chunks
@@ -0,0 +1,38 @@
+"""
+Runs the UI verification profiles as pytest tests against the dev server at
+APP_URL (start it with `npm run dev`). Each xdist worker gets its own browser
+profile directory; within a worker, all tests share one browser on a
+session-scoped event loop.
+"""
+import socket
+from urllib.parse import urlparse
+
+import pytest
+
+pytest.importorskip("playwright.async_api")
+pytest_asyncio = pytest.importorskip("pytest_asyncio")
+
+from verify_all import PROFILES
+from verify_common import APP_URL, close_context, run_checks
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+def _dev_server_up():
+    url = urlparse(APP_URL)
+    try:
+        with socket.create_connection((url.hostname, url.port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session", autouse=True)
+async def browser():
+    """Skips when the dev server is down; closes the shared browser at the end."""
+    if not _dev_server_up():
+        pytest.skip(f"dev server not running at {APP_URL}")
+    yield
+    await close_context()
+
+@pytest.mark.parametrize("profile", list(PROFILES))
+async def test_profile(profile):
+    await run_checks(PROFILES[profile])
@@ -1,5 +1,6 @@
 import os
-import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from PIL import Image, ImageDraw
 
 OUTPUT_DIR = "public/textures"
@@ -30,28 +31,32 @@ PALETTE_COLORS = {
 }
 
 def generate_noise(base_color, variation=20):
-    r, g, b = base_color[:3]
-    noise = random.randint(-variation, variation)
-    nr = max(0, min(255, r + noise))
-    ng = max(0, min(255, g + noise))
-    nb = max(0, min(255, b + noise))
-    if len(base_color) > 3:
-        return (nr, ng, nb, base_color[3])
-    return (nr, ng, nb)
+    """
+    Returns a (SIZE, SIZE, 4) uint8 RGBA tile of base_color with one random
+    brightness offset per pixel (shared by R, G and B).
+    """
+    base = np.array(base_color[:3], dtype=np.int16)
+    noise = np.random.randint(-variation, variation + 1, (SIZE, SIZE, 1), dtype=np.int16)
+    tile = np.empty((SIZE, SIZE, 4), dtype=np.uint8)
+    tile[..., :3] = np.clip(base + noise, 0, 255)
+    tile[..., 3] = base_color[3] if len(base_color) > 3 else 255
+    return tile
 
 def create_texture(name, base_colors, num_variations=2):
     if not base_colors: return
 
     for v in range(num_variations):
-        img = Image.new('RGBA', (SIZE, SIZE))
-        pixels = img.load()
-
         base = base_colors[v % len(base_colors)]
 
         # Simple noise pattern
-        for x in range(SIZE):
-            for y in range(SIZE):
-                pixels[x, y] = generate_noise(base)
+        tile = generate_noise(base)
+
+        if "leaves" in name:
+             # Random dots
+             dots = np.random.randint(0, SIZE, (50, 2))
+             tile[dots[:, 1], dots[:, 0]] = (0, 80, 0, 255)
+
+        img = Image.fromarray(tile, 'RGBA')
 
         # Add some simple patterns
         draw = ImageDraw.Draw(img)
@@ -67,24 +72,26 @@ def create_texture(name, base_colors, num_variations=2):
              for i in range(0, SIZE, 8):
                  draw.line([(i, 0), (i, SIZE)], fill=(50, 30, 10, 50), width=1)
 
-        if "leaves" in name:
-             # Random dots
-             for _ in range(50):
-                 x = random.randint(0, SIZE-1)
-                 y = random.randint(0, SIZE-1)
-                 pixels[x, y] = (0, 80, 0)
-
         filename = f"{name}_{v+1}.png"
-        img.save(os.path.join(OUTPUT_DIR, filename))
+        # Small noisy tiles barely compress; zlib level 1 is much faster than the default 6
+        img.save(os.path.join(OUTPUT_DIR, filename), optimize=False, compress_level=1)
         print(f"Generated {filename}")
 
+def _init_worker():
+    # Forked workers inherit the parent's RNG state; reseed so each one
+    # produces its own noise.
+    np.random.seed()
+
 def main():
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
-    for name, colors in PALETTE_COLORS.items():
-        if colors:
-            create_texture(name, colors, num_variations=2)
+    # Each palette entry is independent, so textures are built in parallel
+    work = [(name, colors) for name, colors in PALETTE_COLORS.items() if colors]
+    with ProcessPoolExecutor(initializer=_init_worker) as pool:
+        futures = [pool.submit(create_texture, name, colors, 2) for name, colors in work]
+        for future in futures:
+            future.result()
 
 if __name__ == "__main__":
     main()
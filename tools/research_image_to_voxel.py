@@ -1,5 +1,7 @@
 import os
 import sys
+import hashlib
+import functools
 import numpy as np
 from PIL import Image, ImageDraw
 import argparse
@@ -15,6 +17,12 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
     print("Warning: transformers/torch not found. Running in dummy mode.")
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 # --- Configuration & Constants ---
 
 PALETTE_HEX = {
@@ -53,6 +61,50 @@ def hex_to_rgb(hex_str):
 
 PALETTE_RGB = np.array([hex_to_rgb(PALETTE_HEX[name]) for name in PALETTE_NAMES])
 
+# Directory the palette LUT is persisted in between runs (the user cache dir
+# by default); override with VOXELITO_LUT_CACHE_DIR or --lut-cache-dir
+LUT_CACHE_DIR = os.environ.get("VOXELITO_LUT_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "voxelito"
+)
+
+def build_palette_lut():
+    """
+    Exact nearest-palette index for every 24-bit RGB color (16 MB, uint8).
+    Built one R plane at a time; the G/B part of the distance is shared by
+    all planes. Ties resolve to the lowest index, like np.argmin.
+    """
+    pal = PALETTE_RGB.astype(np.int32)
+    g, b = np.meshgrid(np.arange(256), np.arange(256), indexing='ij')
+    gb_dist = (g.reshape(-1, 1) - pal[:, 1]) ** 2 + (b.reshape(-1, 1) - pal[:, 2]) ** 2 # (65536, M)
+    lut = np.empty(1 << 24, dtype=np.uint8)
+    for r in range(256):
+        lut[r << 16:(r + 1) << 16] = np.argmin(gb_dist + (r - pal[:, 0]) ** 2, axis=1)
+    return lut
+
+@functools.lru_cache(maxsize=1)
+def load_palette_lut():
+    """
+    Returns the palette LUT, memory-mapped from LUT_CACHE_DIR. It is built
+    and saved there on the first run only; the file name is keyed by the
+    palette. Memoized, so each process resolves it once.
+    """
+    key = hashlib.sha1(PALETTE_RGB.astype(np.int32).tobytes()).hexdigest()[:12]
+    path = os.path.join(LUT_CACHE_DIR, f"palette_lut_{key}.npy")
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r")
+    print("Building palette LUT...")
+    lut = build_palette_lut()
+    try:
+        os.makedirs(LUT_CACHE_DIR, exist_ok=True)
+        # Write then rename, so a concurrent run never maps a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, lut)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not cache palette LUT: {e}")
+    return lut
+
 # --- Components ---
 
 class ImageGenerator:
@@ -78,6 +130,19 @@ class ImageGenerator:
             print("Real image generation not implemented in prototype, using dummy.")
             return self.generate(prompt, size)
 
+@functools.lru_cache(maxsize=8)
+def _dummy_depth(w, h):
+    """
+    Radial gradient (center is close/bright, edges far/dark) as 8-bit depth.
+    Depends only on size, so it is cached (read-only).
+    """
+    x = np.linspace(-1, 1, w)
+    y = np.linspace(-1, 1, h)
+    xv, yv = np.meshgrid(x, y)
+    d = (np.clip(1.0 - np.hypot(xv, yv), 0, 1) * 255).astype(np.uint8)
+    d.setflags(write=False)
+    return d
+
 class DepthEstimator:
     def __init__(self, model_id="depth-anything/Depth-Anything-V2-Small-hf", dummy=False):
         self.dummy = dummy
@@ -94,25 +159,52 @@ class DepthEstimator:
     def estimate(self, image):
         if self.dummy:
             print("Estimating dummy depth...")
-            # Create a radial gradient (center is close/bright, edges far/dark)
             w, h = image.size
-            x = np.linspace(-1, 1, w)
-            y = np.linspace(-1, 1, h)
-            xv, yv = np.meshgrid(x, y)
-            d = 1.0 - np.sqrt(xv**2 + yv**2)
-            d = np.clip(d, 0, 1)
-            # Convert to PIL Image
-            depth_img = Image.fromarray((d * 255).astype(np.uint8))
-            return depth_img
+            return Image.fromarray(_dummy_depth(w, h))
 
         # Real estimation
         print("Running depth inference...")
         depth = self.pipe(image)["depth"]
         return depth
 
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _project_kernel(img_arr, depth_arr, f_x, f_y, c_x, c_y, z_lut, palette_lut):
+        """
+        Fused background test, unproject, quantize and palette lookup.
+        Pixel (v, u) writes slot v * W + u, so compacting by `valid`
+        preserves row-major pixel order.
+        """
+        H, W = depth_arr.shape
+        n = H * W
+        valid = np.zeros(n, dtype=np.bool_)
+        ix = np.empty(n, dtype=np.int64)
+        iy = np.empty(n, dtype=np.int64)
+        iz = np.empty(n, dtype=np.int64)
+        mats = np.empty(n, dtype=np.uint8)
+        for v in prange(H):
+            for u in range(W):
+                r = img_arr[v, u, 0]
+                g = img_arr[v, u, 1]
+                b = img_arr[v, u, 2]
+                if r >= 250 and g >= 250 and b >= 250:
+                    continue
+                k = v * W + u
+                z = z_lut[depth_arr[v, u]]
+                ix[k] = int(np.rint((u - c_x) * z / f_x))
+                iy[k] = int(np.rint(-(v - c_y) * z / f_y))
+                iz[k] = int(np.rint(z))
+                mats[k] = palette_lut[(np.uint32(r) << 16) | (np.uint32(g) << 8) | np.uint32(b)]
+                valid[k] = True
+        return valid, ix, iy, iz, mats
+
 class VoxelProjector:
-    def __init__(self, scene_size=128):
+    def __init__(self, scene_size=128, z_min=20.0, z_max=120.0):
         self.scene_size = scene_size
+        # 8-bit depth -> Z lookup: map depth 0..1 to Z range [z_min, z_max]
+        # (white is close), so projection needs one load per pixel
+        levels = np.arange(256, dtype=np.float32) / 255.0
+        self._z_lut = z_max - levels * (z_max - z_min)
 
     def find_nearest_material(self, rgb_array):
         # rgb_array: (N, 3)
@@ -124,30 +216,11 @@ class VoxelProjector:
         # For prototype (512x512 = 262k pixels), we'll do it purely on valid voxels.
         pass
 
-    def project(self, image, depth_map, fov_deg=45.0, threshold=0.1):
+    def _project_numpy(self, img_arr, depth_arr, f_x, f_y, c_x, c_y):
         """
-        Projects image + depth into a list of (x, y, z, mat_idx)
+        NumPy fallback for _project_kernel: returns (ix, iy, iz, mat_idx)
+        for every foreground pixel in row-major order.
         """
-        w, h = image.size
-        # Resize depth to match image if needed
-        if depth_map.size != image.size:
-            depth_map = depth_map.resize(image.size)
-
-        img_arr = np.array(image) # (H, W, 3)
-        depth_arr = np.array(depth_map).astype(np.float32) / 255.0 # (H, W) Normalized 0-1
-
-        # Camera Intrinsics
-        # f = (W/2) / tan(fov/2)
-        f_x = (w / 2.0) / np.tan(np.deg2rad(fov_deg / 2.0))
-        f_y = (h / 2.0) / np.tan(np.deg2rad(fov_deg / 2.0))
-        c_x = w / 2.0
-        c_y = h / 2.0
-
-        # Grid Setup
-        voxels = {} # (x,y,z) -> material_index
-
-        print(f"Projecting {w}x{h} pixels...")
-
         # Optimization: Filter out background (infinite depth or white color)
         # Let's assume white background in image means empty
         # Threshold for white: R>240 and G>240 and B>240
@@ -156,21 +229,7 @@ class VoxelProjector:
         # Get indices of foreground pixels
         y_idxs, x_idxs = np.where(mask_fg)
 
-        if len(y_idxs) == 0:
-            print("No foreground pixels found.")
-            return []
-
-        # Process standard depth
-        # Map depth 0..1 to Z world coordinates
-        # Let's say scene depth is 100 voxels.
-        # Z_cam = some_base + depth_val * scale
-        # But commonly depth maps are inverse depth or just relative.
-        # Let's assume linear mapping for now: 0 (black) is far, 1 (white) is close.
-        # Wait, usually white is close in depth maps.
-        # Let's map 0..1 to Z range [20, 120]
-        z_min, z_max = 20.0, 120.0
-
-        z_vals = z_max - (depth_arr[y_idxs, x_idxs] * (z_max - z_min))
+        z_vals = self._z_lut[depth_arr[y_idxs, x_idxs]]
 
         # Unproject
         # x = (u - cx) * z / fx
@@ -184,54 +243,80 @@ class VoxelProjector:
         z_3d = z_vals
 
         # Quantize to integer coordinates
-        # Center them
         ix = np.round(x_3d).astype(int)
         iy = np.round(y_3d).astype(int)
         iz = np.round(z_3d).astype(int)
 
-        # Get colors
+        # Static nearest-palette table: one indexed load per pixel
         colors = img_arr[y_idxs, x_idxs]
+        keys = (colors[:, 0].astype(np.uint32) << 16) | (colors[:, 1].astype(np.uint32) << 8) | colors[:, 2]
+        material_indices = load_palette_lut()[keys]
 
-        # Batch match colors
-        # This is the slow part if done naively.
-        # For N pixels and M palette colors:
-        # dist = sum((color - palette)^2)
-
-        # Simple closest color
-        # We can use KDTree or just broadcasting for small palette
-        # Broadcast: (N, 1, 3) - (1, M, 3)
-        N = len(colors)
-        if N > 0:
-            # Chunking to avoid OOM
-            chunk_size = 10000
-            material_indices = np.zeros(N, dtype=int)
-
-            for i in range(0, N, chunk_size):
-                end = min(i + chunk_size, N)
-                chunk_colors = colors[i:end] # (C, 3)
-                # (C, 1, 3) - (1, M, 3) -> (C, M, 3)
-                diff = chunk_colors[:, np.newaxis, :] - PALETTE_RGB[np.newaxis, :, :]
-                dists = np.sum(diff**2, axis=2) # (C, M)
-                material_indices[i:end] = np.argmin(dists, axis=1)
-
-            # Fill voxel dict
-            for k in range(N):
-                key = (ix[k], iy[k], iz[k])
-                # Simple z-buffering strategy: closest pixel overwrites?
-                # Or just keep last?
-                # Since we iterate arbitrary, let's just write.
-                voxels[key] = material_indices[k]
+        return ix, iy, iz, material_indices
+
+    def project(self, image, depth_map, fov_deg=45.0, threshold=0.1):
+        """
+        Projects image + depth into a list of (x, y, z, mat_idx)
+        """
+        w, h = image.size
+        # Resize depth to match image if needed
+        if depth_map.size != image.size:
+            depth_map = depth_map.resize(image.size)
+
+        img_arr = np.array(image) # (H, W, 3)
+        depth_arr = np.asarray(depth_map, dtype=np.uint8) # (H, W) 8-bit depth
+
+        # Camera Intrinsics
+        # f = (W/2) / tan(fov/2)
+        f_x = (w / 2.0) / np.tan(np.deg2rad(fov_deg / 2.0))
+        f_y = (h / 2.0) / np.tan(np.deg2rad(fov_deg / 2.0))
+        c_x = w / 2.0
+        c_y = h / 2.0
+
+        print(f"Projecting {w}x{h} pixels...")
+
+        if NUMBA_AVAILABLE:
+            # One fused pass over the image instead of a temporary per step
+            valid, ix, iy, iz, material_indices = _project_kernel(
+                img_arr, depth_arr, f_x, f_y, c_x, c_y, self._z_lut, np.asarray(load_palette_lut())
+            )
+            ix, iy, iz, material_indices = ix[valid], iy[valid], iz[valid], material_indices[valid]
+        else:
+            ix, iy, iz, material_indices = self._project_numpy(img_arr, depth_arr, f_x, f_y, c_x, c_y)
+
+        N = len(ix)
+        if N == 0:
+            print("No foreground pixels found.")
+            return []
+
+        # Fill voxel dict
+        # Several pixels can land on one voxel; keep the last one (as
+        # sequential writes would). Coordinates are offset to be
+        # non-negative and packed into one key so np.unique can pick
+        # that pixel without a Python loop.
+        xyz = np.stack([ix, iy, iz], axis=1)
+        rel = xyz - xyz.min(axis=0)
+        K = rel.max(axis=0).astype(np.int64) + 1
+        keys = (rel[:, 0].astype(np.int64) * K[1] + rel[:, 1]) * K[2] + rel[:, 2]
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = N - 1 - last
+        voxels = dict(zip(map(tuple, xyz[keep].tolist()), material_indices[keep].tolist()))
 
         return voxels
 
 # --- Main ---
 
 def main():
+    global LUT_CACHE_DIR
     parser = argparse.ArgumentParser(description="Image to Voxel Prototype")
     parser.add_argument("--prompt", type=str, default="A red sphere")
     parser.add_argument("--dummy", action="store_true", help="Force dummy mode")
+    parser.add_argument("--lut-cache-dir", type=str, default=LUT_CACHE_DIR,
+                        help="Directory the 16 MB palette LUT is persisted in between runs (default: %(default)s)")
     args = parser.parse_args()
 
+    LUT_CACHE_DIR = args.lut_cache_dir
+
     print("--- Image to Voxel Research Prototype ---")
 
     # 1. Generate Image
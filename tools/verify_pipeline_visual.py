@@ -14,54 +14,44 @@ from api.common import PALETTE_RGB
 def plot_voxels(chunks, filename):
     # Decode chunks
     points = []
-    colors = []
+    vals_expanded = []
 
     # Simple palette map (index -> rgb)
     palette = np.array(PALETTE_RGB) / 255.0
 
     print(f"Decoding {len(chunks)} chunks for {filename}...")
 
-    total_voxels = 0
     for chunk in chunks:
         # chunk is ChunkResponse object
         cx, cy, cz = chunk.position
         rle = chunk.rle_data
 
         parts = rle.split(',')
-        idx = 0
-        for part in parts:
-            if ':' not in part: continue
-            val, count = map(int, part.split(':'))
-
-            if val != 0: # 0 is air
-                # decode positions
-                # Chunk size is 32
-                # But optimized: only compute if we need to
-                # We can iterate k
-                for k in range(count):
-                    # Local index to x,y,z
-                    # index = x + y*32 + z*32*32
-                    current_idx = idx + k
-                    lx = current_idx % 32
-                    ly = (current_idx // 32) % 32
-                    lz = (current_idx // (32*32)) % 32
-
-                    x = cx * 32 + lx
-                    y = cy * 32 + ly
-                    z = cz * 32 + lz
-
-                    points.append([x, y, z])
-                    if val > 0 and val < len(palette):
-                        colors.append(palette[val])
-                    else:
-                        colors.append([0.5, 0.5, 0.5]) # Gray fallback
-                    total_voxels += 1
-
-            idx += count
-
-    print(f"Total voxels: {total_voxels}")
-    points = np.array(points)
-    colors = np.array(colors)
+        tokens = np.array([part.split(':') for part in parts if ':' in part], dtype=np.int32).reshape(-1, 2)
+        vals, cnts = tokens[:, 0], tokens[:, 1]
+        starts = np.cumsum(cnts) - cnts
+
+        # Expand every non-air run (0 is air) into its voxel indices
+        solid = vals != 0
+        run_vals, run_starts, run_cnts = vals[solid], starts[solid], cnts[solid]
+        offsets = np.cumsum(run_cnts) - run_cnts
+        all_idx = np.repeat(run_starts - offsets, run_cnts) + np.arange(run_cnts.sum())
+
+        # Local index to x,y,z: index = x + y*32 + z*32*32
+        lx = all_idx & 31
+        ly = (all_idx >> 5) & 31
+        lz = (all_idx >> 10) & 31
+
+        points.append(np.stack([cx * 32 + lx, cy * 32 + ly, cz * 32 + lz], axis=-1))
+        vals_expanded.append(np.repeat(run_vals, run_cnts))
+
+    points = np.concatenate(points) if points else np.empty((0, 3), dtype=np.int64)
+    vals_expanded = np.concatenate(vals_expanded) if vals_expanded else np.empty(0, dtype=np.int32)
+    print(f"Total voxels: {len(points)}")
+
+    safe = np.clip(vals_expanded, 0, len(palette) - 1)
+    colors = palette[safe]
+    colors[(vals_expanded <= 0) | (vals_expanded >= len(palette))] = [0.5, 0.5, 0.5] # Gray fallback
 
     if len(points) == 0:
         print(f"No voxels to plot for {filename}")
@@ -72,7 +62,8 @@ def plot_voxels(chunks, filename):
 
     # Downsample if too many points for matplotlib
     if len(points) > 10000:
-        indices = np.random.choice(len(points), 10000, replace=False)
+        # Sample with replacement: O(K) instead of shuffling all N indices
+        indices = np.random.default_rng().integers(0, len(points), 10000)
         points = points[indices]
         colors = colors[indices]
 
@@ -96,12 +87,15 @@ async def run_test():
     print("Initializing Pipeline...")
     pipeline = ImageToVoxelPipeline()
 
-    print("Running Multi-View Test (Red)...")
-    chunks_mv = await pipeline.run("A red car", multi_view=True)
-    plot_voxels(chunks_mv, "pipeline_result_multiview.png")
+    # The two runs are independent, so let their generation and depth steps overlap
+    print("Running Multi-View Test (Red) and Single-View Test (Blue)...")
+    chunks_mv, chunks_sv = await asyncio.gather(
+        pipeline.run("A red car", multi_view=True),
+        pipeline.run("A blue tree", multi_view=False),
+    )
 
-    print("Running Single-View Test (Blue)...")
-    chunks_sv = await pipeline.run("A blue tree", multi_view=False)
+    # matplotlib is not thread-safe; plot one after the other
+    plot_voxels(chunks_mv, "pipeline_result_multiview.png")
     plot_voxels(chunks_sv, "pipeline_result_singleview.png")
 
 if __name__ == "__main__":
@@ -0,0 +1,34 @@
+"""
+Runs UI verification checks concurrently against one headless browser.
+
+Usage:
+    python verify_all.py                      # every profile
+    python verify_all.py --profile ui neon    # selected profiles only
+"""
+import argparse
+import functools
+
+import verify_camera
+import verify_neon
+import verify_ui
+import verify_ui_voxelito
+from verify_common import run_checks_sync
+
+PROFILES = {
+    "ui": verify_ui.check_ui,
+    "voxelito": verify_ui_voxelito.check_voxelito,
+    "voxelito-scene": functools.partial(verify_ui_voxelito.check_voxelito, adjust_camera=True),
+    "neon": verify_neon.check_neon_ui,
+    "camera": verify_camera.check_camera,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Run UI verification checks")
+    parser.add_argument("--profile", nargs="+", choices=list(PROFILES), default=list(PROFILES),
+                        help="Checks to run (default: all)")
+    args = parser.parse_args()
+
+    run_checks_sync(*(PROFILES[name] for name in args.profile))
+
+if __name__ == "__main__":
+    main()
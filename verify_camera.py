@@ -1,24 +1,18 @@
-from playwright.sync_api import sync_playwright
+from verify_common import APP_URL, DEFAULT_TIMEOUT, run_checks_sync, save_screenshot
 
-def verify_camera():
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        try:
-            page.goto("http://localhost:5173")
-            page.wait_for_selector("text=Reset View", timeout=10000)
+async def check_camera(page):
+    await page.goto(APP_URL, wait_until="domcontentloaded")
+    await page.wait_for_selector("text=Reset View", timeout=DEFAULT_TIMEOUT)
+
+    # Click Reset View
+    await page.locator("text=Reset View").click(no_wait_after=True)
+    await page.wait_for_timeout(1000)
 
-            # Click Reset View
-            page.click("text=Reset View")
-            page.wait_for_timeout(1000)
+    # Take screenshot
+    await save_screenshot(page, "verification_camera.png")
 
-            # Take screenshot
-            page.screenshot(path="verification_camera.png")
-            print("Screenshot captured: verification_camera.png")
-        except Exception as e:
-            print(f"Verification failed: {e}")
-        finally:
-            browser.close()
+def verify_camera():
+    run_checks_sync(check_camera)
 
 if __name__ == "__main__":
     verify_camera()
@@ -0,0 +1,187 @@
+"""
+Shared Playwright plumbing for the UI verification scripts.
+One headless Chromium is launched per process and shared by every check
+(each on its own page), so several checks can run concurrently. The browser profile is kept
+in USER_DATA_DIR so later runs reuse the HTTP cache for the dev bundle;
+only one run at a time can hold the profile.
+
+The browser is the slim headless-shell build; install it once with
+`playwright install chromium-headless-shell`. Set
+VERIFY_BROWSER_CHANNEL=chromium to use full Chromium instead (e.g. for
+checks that need the full rendering path).
+"""
+import asyncio
+import atexit
+import hashlib
+import os
+from playwright.async_api import async_playwright
+
+APP_URL = "http://localhost:5173"
+BROWSER_CHANNEL = os.environ.get("VERIFY_BROWSER_CHANNEL", "chromium-headless-shell")
+# One profile per pytest-xdist worker: a Chromium profile can only be held by
+# one browser at a time
+USER_DATA_DIR = ".playwright-cache" + (f"-{os.environ['PYTEST_XDIST_WORKER']}" if "PYTEST_XDIST_WORKER" in os.environ else "")
+
+# Don't block screenshots on document.fonts.ready; keeps captures
+# deterministic and fast when fonts are blocked or slow to load
+os.environ.setdefault("PW_TEST_SCREENSHOT_NO_FONTS_READY", "1")
+
+# Timeouts (ms) sized for a local dev server, so a missing element fails fast
+DEFAULT_TIMEOUT = 2000
+POPUP_TIMEOUT = 1500
+
+# Viewport for checks whose screenshot is only a diagnostic; PNG encode cost
+# scales with pixel count (the default is 1280x720)
+SMALL_VIEWPORT = {"width": 800, "height": 600}
+
+# Switch off Chromium background services none of the checks need
+# (networking, crash reporting, updates, extensions, throttling)
+MINIMAL_ARGS = [
+    "--disable-background-networking",
+    "--disable-breakpad",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-hang-monitor",
+    "--disable-ipc-flooding-protection",
+    "--disable-renderer-backgrounding",
+    "--disable-sync",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--no-pings",
+    "--hide-scrollbars",
+    "--disable-dev-shm-usage",
+]
+
+# Installed once per context; moves the camera so the whole scene is in
+# frame. Checks call it with page.evaluate("window.__adjustCamera()").
+ADJUST_CAMERA_JS = """
+    window.__adjustCamera = () => {
+        if (window.voxelWorld) {
+            window.voxelWorld.camera.position.set(0, 60, 60);
+            window.voxelWorld.controls.target.set(0, 0, 0);
+            window.voxelWorld.controls.update();
+            window.voxelWorld.requestRender();
+        }
+    };
+"""
+
+# Image, font and media files no text/selector assertion depends on. Patterns
+# match the whole URL, so Vite's "?import" module wrappers for assets still load.
+BLOCKED_URL_PATTERNS = [
+    f"*.{ext}" for ext in (
+        "png", "jpg", "jpeg", "gif", "webp", "avif", "svg", "ico",
+        "woff", "woff2", "ttf", "otf",
+        "mp3", "mp4", "webm", "ogg", "wav",
+    )
+]
+
+async def block_heavy_resources(page):
+    """
+    Blocks image, font and media requests for checks that only assert on the
+    DOM. Uses Chromium's own URL blocklist (CDP) rather than page.route, which
+    would disable the HTTP cache and send every dev-server module through Python.
+    """
+    client = await page.context.new_cdp_session(page)
+    await client.send("Network.enable")
+    await client.send("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+async def save_screenshot(target, path, **options):
+    """
+    Screenshots a page or locator and writes `path` only when the image
+    differs from the last run, tracked by a `<path>.sha256` sidecar.
+    """
+    buf = await target.screenshot(**options)
+    digest = hashlib.sha256(buf).hexdigest()
+    sidecar = path + ".sha256"
+    if os.path.exists(path) and os.path.exists(sidecar):
+        with open(sidecar) as f:
+            if f.read() == digest:
+                print(f"Screenshot unchanged: {path}")
+                return
+    with open(path, "wb") as f:
+        f.write(buf)
+    with open(sidecar, "w") as f:
+        f.write(digest)
+    print(f"Screenshot captured: {path}")
+
+async def _run_check(context, check):
+    """Runs a single check(page) coroutine in a fresh page."""
+    page = await context.new_page()
+    page.set_default_timeout(DEFAULT_TIMEOUT)
+    try:
+        await check(page)
+    finally:
+        await page.close()
+
+_playwright = None
+_context = None
+_context_loop = None
+_loop = None
+
+async def get_context():
+    """
+    Returns the browser context, launching headless Chromium on the
+    persistent profile the first time it is needed. Playwright objects are
+    bound to the event loop that created them, and the profile can only be
+    held by one browser, so using it from another loop is an error; call
+    close_context() from the original loop first.
+    """
+    global _playwright, _context, _context_loop
+    loop = asyncio.get_running_loop()
+    if _context is not None and _context_loop is not loop:
+        raise RuntimeError(
+            "The verification browser belongs to another event loop; "
+            "call close_context() from that loop before reusing it"
+        )
+    if _context is None:
+        _playwright = await async_playwright().start()
+        _context = await _playwright.chromium.launch_persistent_context(
+            USER_DATA_DIR,
+            headless=True, channel=BROWSER_CHANNEL, args=MINIMAL_ARGS, chromium_sandbox=False,
+            device_scale_factor=1
+        )
+        await _context.add_init_script(script=ADJUST_CAMERA_JS)
+        _context_loop = loop
+    return _context
+
+async def close_context():
+    """Closes the shared browser context, if one was launched."""
+    global _playwright, _context, _context_loop
+    if _context is not None:
+        await _context.close()
+        await _playwright.stop()
+        _playwright = _context = _context_loop = None
+
+async def run_checks(*checks):
+    """
+    Runs the given check(page) coroutines concurrently on the shared browser,
+    each on its own page. Every check runs to completion; the first failure
+    is then re-raised.
+    """
+    context = await get_context()
+    results = await asyncio.gather(*(_run_check(context, check) for check in checks), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+def _shutdown():
+    _loop.run_until_complete(close_context())
+    _loop.close()
+
+def run_checks_sync(*checks):
+    """
+    Blocking entry point for the scripts. Every call in a process shares one
+    event loop and therefore one browser, which is closed at exit. Failures
+    are reported rather than raised.
+    """
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        atexit.register(_shutdown)
+    try:
+        _loop.run_until_complete(run_checks(*checks))
+    except Exception as e:
+        print(f"Verification failed: {e}")
@@ -2,36 +2,31 @@
 Verification script for the Neon UI components.
 Uses Playwright to launch the browser, verify the neon logo, and capture screenshots.
 """
-from playwright.sync_api import sync_playwright
-import time
+from verify_common import APP_URL, DEFAULT_TIMEOUT, run_checks_sync, save_screenshot
 
-def verify_neon_ui():
+async def check_neon_ui(page):
     """
     Verifies the presence and rendering of the Neon Logo component.
     Captures screenshots of the logo and the full page.
     """
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        try:
-            # Navigate to the app
-            page.goto("http://localhost:5173")
+    # Navigate to the app
+    await page.goto(APP_URL, wait_until="domcontentloaded")
 
-            # Wait for the app to load and the neon logo container
-            page.wait_for_selector(".neon-logo-container", timeout=10000)
+    # Wait for the app to load and the neon logo container
+    await page.wait_for_selector(".neon-logo-container", timeout=DEFAULT_TIMEOUT)
 
-            # Take a screenshot of the neon logo area specifically
-            logo = page.locator(".neon-logo-container")
-            logo.screenshot(path="verification_neon_logo.png")
+    # Take a screenshot of the neon logo area specifically
+    logo = page.locator(".neon-logo-container")
+    await save_screenshot(logo, "verification_neon_logo.png")
 
-            # Take a full page screenshot
-            page.screenshot(path="verification_neon_full.png")
-            print("Screenshots captured: verification_neon_logo.png, verification_neon_full.png")
+    # Take a full page screenshot
+    await save_screenshot(page, "verification_neon_full.png")
 
-        except Exception as e:
-            print(f"Verification failed: {e}")
-        finally:
-            browser.close()
+def verify_neon_ui():
+    """
+    Launches the application in a headless browser and verifies the Neon Logo.
+    """
+    run_checks_sync(check_neon_ui)
 
 if __name__ == "__main__":
     verify_neon_ui()
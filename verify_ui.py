@@ -2,54 +2,55 @@
 General UI verification script.
 Checks if the main application components (header, chat popup) are loading correctly.
 """
-from playwright.sync_api import sync_playwright
-import time
+from verify_common import (
+    APP_URL, DEFAULT_TIMEOUT, POPUP_TIMEOUT, SMALL_VIEWPORT,
+    block_heavy_resources, run_checks_sync, save_screenshot,
+)
 
-def verify_ui():
+async def check_ui(page):
     """
-    Launches the application in a headless browser and performs a sanity check on the UI.
+    Performs a sanity check on the UI.
     Verifies the presence of the 'VOXELVERSE' text and the CopilotKit chat button.
     Takes a screenshot upon success.
     """
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        try:
-            # Navigate to the app
-            page.goto("http://localhost:5173")
-
-            # Wait for the app to load (check for Voxelito header)
-            page.wait_for_selector("text=Voxelito", timeout=10000)
-
-            # Wait for the chat popup to be visible (CopilotKit)
-            page.wait_for_selector(".copilotKitButton", timeout=10000)
-
-            # Click the chat button to open the popup
-            page.click(".copilotKitButton")
-
-            # Wait for the popup to open
-            page.wait_for_selector(".copilotKitPopup", timeout=5000)
-
-            # Take a screenshot of the entire UI with the open chat
-
-            # Adjust camera to see the full scene
-            page.evaluate("""
-                if (window.voxelWorld) {
-                    window.voxelWorld.camera.position.set(0, 60, 60);
-                    window.voxelWorld.controls.target.set(0, 0, 0);
-                    window.voxelWorld.controls.update();
-                    window.voxelWorld.requestRender();
-                }
-            """)
-            page.wait_for_timeout(1000)
-
-            page.screenshot(path="verification.png")
-            print("Screenshot captured: verification.png")
-
-        except Exception as e:
-            print(f"Verification failed: {e}")
-        finally:
-            browser.close()
+    # Only the DOM is asserted on; skip images, fonts and media and keep the
+    # diagnostic screenshot small
+    await block_heavy_resources(page)
+    await page.set_viewport_size(SMALL_VIEWPORT)
+
+    # Navigate to the app
+    await page.goto(APP_URL, wait_until="domcontentloaded")
+
+    # In one in-page polling loop: wait for the Voxelito header and the
+    # CopilotKit chat button, click the button once, then wait for the popup
+    await page.wait_for_function("""() => {
+        if (!document.body.textContent.includes('Voxelito')) return false;
+        const btn = document.querySelector('.copilotKitButton');
+        if (!btn) return false;
+        if (!window.__chatClicked) {
+            window.__chatClicked = true;
+            btn.click();
+        }
+        return !!document.querySelector('.copilotKitPopup');
+    }""", timeout=DEFAULT_TIMEOUT + POPUP_TIMEOUT)
+
+    # Take a screenshot of the entire UI with the open chat
+
+    # Adjust camera to see the full scene
+    await page.evaluate("window.__adjustCamera()")
+    # The render loop clears renderRequested once the new frame is drawn
+    await page.wait_for_function(
+        "!window.voxelWorld || !window.voxelWorld.renderRequested", timeout=DEFAULT_TIMEOUT
+    )
+
+    # Diagnostic only, so lossy JPEG is fine and much cheaper to encode than PNG
+    await save_screenshot(page, "verification.jpg", type="jpeg", quality=70)
+
+def verify_ui():
+    """
+    Launches the application in a headless browser and performs a sanity check on the UI.
+    """
+    run_checks_sync(check_ui)
 
 if __name__ == "__main__":
     verify_ui()